@@ -1,11 +1,15 @@
 import os
+import sys
 import time
 import asyncio
 import logging
-from typing import Dict
+import contextlib
+import weakref
+from typing import AsyncIterator
 
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
 import discord
 from discord import app_commands
 
@@ -19,10 +23,19 @@ if not all([OPENAI_KEY, DISCORD_TOKEN, ASSISTANT_ID]):
     raise SystemExit("Missing required env vars: OPENAI_KEY, DISCORD_TOKEN, ASSISTANT_ID")
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s: %(message)s")
-openai_client = OpenAI(api_key=OPENAI_KEY)
+openai_client = AsyncOpenAI(api_key=OPENAI_KEY)
 
-# Keep one assistant thread per Discord channel
-CHANNEL_THREAD_CACHE: Dict[int, str] = {}
+# Run statuses after which the assistant will not produce more output
+TERMINAL_RUN_STATUSES = {"completed", "failed", "cancelled", "expired", "incomplete"}
+
+# Keep one assistant thread per Discord channel (bounded; entries are refreshed on
+# use, so only channels idle for a day lose their thread)
+CHANNEL_THREAD_CACHE: TTLCache = TTLCache(maxsize=1000, ttl=86400)
+threads_created = 0
+
+# Serialize thread creation per channel so concurrent /ask calls share one thread.
+# Weak values: a lock lives exactly as long as some task holds or awaits it.
+CHANNEL_THREAD_LOCKS: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
 
 # ---------- Assistant Configuration ----------
 def get_system_instructions() -> str:
@@ -55,63 +68,84 @@ GUIDELINES:
 # ---------- Assistants API Helpers ----------
 async def get_or_create_thread(channel_id: int) -> str:
     """Get existing thread for channel or create new one."""
-    if channel_id in CHANNEL_THREAD_CACHE:
-        return CHANNEL_THREAD_CACHE[channel_id]
+    global threads_created
+    thread_id = CHANNEL_THREAD_CACHE.get(channel_id)
+    if thread_id is not None:
+        # Re-insert to restart the TTL, which otherwise counts from creation
+        CHANNEL_THREAD_CACHE[channel_id] = thread_id
+        return thread_id
     
-    thread = openai_client.beta.threads.create()
-    CHANNEL_THREAD_CACHE[channel_id] = thread.id
-    logging.info(f"Created new thread {thread.id} for channel {channel_id}")
+    lock = CHANNEL_THREAD_LOCKS.setdefault(channel_id, asyncio.Lock())
+    async with lock:
+        # Another /ask may have created it while we waited for the lock
+        thread_id = CHANNEL_THREAD_CACHE.get(channel_id)
+        if thread_id is not None:
+            return thread_id
+        
+        thread = await openai_client.beta.threads.create()
+        CHANNEL_THREAD_CACHE[channel_id] = thread.id
+        logging.info(f"Created new thread {thread.id} for channel {channel_id}")
+    
+    threads_created += 1
+    if threads_created % 100 == 0:
+        logging.info(f"Thread cache holds {len(CHANNEL_THREAD_CACHE)} channels")
     return thread.id
 
-def run_assistant_blocking(thread_id: str, user_question: str) -> str:
+async def stream_assistant(thread_id: str, user_question: str) -> AsyncIterator[str]:
     """
-    Run the assistant (blocking call - use in thread pool).
-    Returns the assistant's response text.
+    Run the assistant and yield its response text as it is generated.
+    A run that is abandoned part-way (e.g. on timeout) is cancelled.
     """
     # Add user message
-    openai_client.beta.threads.messages.create(
+    await openai_client.beta.threads.messages.create(
         thread_id=thread_id,
         role="user",
         content=user_question
     )
     
-    # Create and run
-    run = openai_client.beta.threads.runs.create(
+    # Create and stream the run
+    async with openai_client.beta.threads.runs.stream(
         thread_id=thread_id,
         assistant_id=ASSISTANT_ID,
         instructions=get_system_instructions()
-    )
-    
-    # Poll for completion
-    start = time.time()
-    while True:
-        status = openai_client.beta.threads.runs.retrieve(
-            thread_id=thread_id, 
-            run_id=run.id
-        )
-        
-        if status.status == "completed":
-            break
-        
-        if status.status in {"failed", "cancelled", "expired"}:
-            error_msg = getattr(status, 'last_error', None)
-            raise RuntimeError(f"Assistant run {status.status}: {error_msg}")
-        
-        if time.time() - start > 120:  # 2 minute timeout
-            openai_client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
-            raise TimeoutError("Assistant took too long to respond")
+    ) as stream:
+        try:
+            async for delta in stream.text_deltas:
+                yield delta
+        finally:
+            run = stream.current_run
+            if run is not None and run.status not in TERMINAL_RUN_STATUSES:
+                try:
+                    await openai_client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run.id)
+                except Exception:
+                    # Don't mask the original error (e.g. the run finished meanwhile)
+                    logging.exception(f"Failed to cancel run {run.id}")
         
-        time.sleep(1.5)
+        run = await stream.get_final_run()
     
-    # Get response
-    messages = openai_client.beta.threads.messages.list(thread_id=thread_id, limit=1)
-    for msg in messages.data:
-        if msg.role == "assistant":
-            for content in msg.content:
-                if content.type == "text":
-                    return content.text.value
-    
-    return "I couldn't generate a response. Please try rephrasing your question."
+    if run.status != "completed":
+        error_msg = getattr(run, 'last_error', None)
+        raise RuntimeError(f"Assistant run {run.status}: {error_msg}")
+
+async def relay_answer(interaction: discord.Interaction, thread_id: str, question: str) -> str:
+    """
+    Stream the assistant's answer into the deferred response, editing it at most
+    once per second to stay within Discord's rate limits. Returns the full text.
+    """
+    answer = ""
+    last_edit = time.monotonic()
+    # aclosing guarantees the run is cancelled even if we fail mid-edit
+    async with contextlib.aclosing(stream_assistant(thread_id, question)) as deltas:
+        async for delta in deltas:
+            answer += delta
+            if len(answer) <= 1900 and time.monotonic() - last_edit >= 1.0:
+                await interaction.edit_original_response(content=answer)
+                last_edit = time.monotonic()
+    return answer
+
+def _chunk_for_discord(text: str, limit: int = 1900) -> list:
+    """Split text into Discord-sized messages (limit ~2000 chars)."""
+    return [text[i:i+limit] for i in range(0, len(text), limit)]
 
 # ---------- Discord Bot ----------
 intents = discord.Intents.default()
@@ -132,30 +166,34 @@ async def on_ready():
 )
 async def ask(interaction: discord.Interaction, question: str):
     """Main command - ask the CI assistant a question."""
-    await interaction.response.defer(thinking=True)
+    # Get or create thread for this channel while the defer round-trip is in flight
+    thread_task = asyncio.create_task(get_or_create_thread(interaction.channel_id))
+    try:
+        await interaction.response.defer(thinking=True)
+    except Exception:
+        # Interaction is unusable (e.g. expired); don't leave the task orphaned
+        thread_task.cancel()
+        await asyncio.gather(thread_task, return_exceptions=True)
+        raise
     
     try:
-        # Get or create thread for this channel
-        thread_id = await get_or_create_thread(interaction.channel_id)
+        thread_id = await thread_task
         
-        # Run assistant (in thread pool to avoid blocking)
-        answer = await asyncio.to_thread(
-            run_assistant_blocking, 
-            thread_id, 
-            question
+        # Stream the answer into the response as it is generated (2 minute timeout)
+        answer = await asyncio.wait_for(
+            relay_answer(interaction, thread_id, question),
+            timeout=120
         )
+        if not answer:
+            answer = "I couldn't generate a response. Please try rephrasing your question."
         
         # Split long responses (Discord limit ~2000 chars)
-        if len(answer) <= 1900:
-            await interaction.followup.send(answer)
-        else:
-            # Split into chunks
-            chunks = [answer[i:i+1900] for i in range(0, len(answer), 1900)]
-            await interaction.followup.send(chunks[0])
-            for chunk in chunks[1:]:
-                await interaction.channel.send(chunk)
+        chunks = _chunk_for_discord(answer)
+        await interaction.edit_original_response(content=chunks[0])
+        for chunk in chunks[1:]:
+            await interaction.channel.send(chunk)
     
-    except TimeoutError:
+    except (TimeoutError, asyncio.TimeoutError):
         await interaction.followup.send(
             "⏱️ The request took too long. Please try a more specific question."
         )
@@ -173,8 +211,7 @@ async def reset(interaction: discord.Interaction):
     """Reset the conversation thread for this channel."""
     channel_id = interaction.channel_id
     
-    if channel_id in CHANNEL_THREAD_CACHE:
-        del CHANNEL_THREAD_CACHE[channel_id]
+    if CHANNEL_THREAD_CACHE.pop(channel_id, None) is not None:
         await interaction.response.send_message(
             "✅ Conversation history cleared for this channel.",
             ephemeral=True
@@ -214,6 +251,24 @@ I'm your Product Marketing Manager specialized in competitive intelligence.
     
     await interaction.response.send_message(help_text, ephemeral=True)
 
+async def main():
+    """Run the bot on the current loop and close the OpenAI client on shutdown."""
+    async with openai_client, bot:
+        await bot.start(DISCORD_TOKEN)
+
 if __name__ == "__main__":
     logging.info("🚀 Starting Red Hat CI Assistant Bot...")
-    bot.run(DISCORD_TOKEN)
+    
+    # libuv-based event loop: cheaper socket I/O for the gateway and OpenAI streams
+    run = asyncio.run
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            run = uvloop.run
+        except ImportError:
+            logging.warning("uvloop not installed; using the default event loop")
+    
+    try:
+        run(main())
+    except KeyboardInterrupt:
+        logging.info("👋 Shutting down")